@@ -0,0 +1,132 @@
+"""Benchmark du démarrage de l'application (time-to-first-element).
+
+Chaque mesure lance un interpréteur Python neuf (démarrage à froid, pandas
+non importé) qui exécute streamlit_app.py via AppTest et horodate le premier
+élément visible envoyé au navigateur (l'en-tête de la page) :
+
+    python bench_startup.py --runs 5 --checkins 2000
+    python bench_startup.py --no-external-fonts
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+APP_FILE = Path(__file__).resolve().parent / "streamlit_app.py"
+
+
+def generate_checkins(nb_checkins, days=60, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now()
+    checkins = []
+    for i in range(nb_checkins):
+        a_probleme = rng.random() < 0.2
+        checkins.append({
+            "id": f"bench_{i}",
+            "collaborateur": rng.choice(["Marie", "Thomas", "Sophie", "Lucas"]),
+            "site": rng.choice(["Site A", "Site B", "Site C"]),
+            "poste": "Technicien",
+            "date": (now - timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d"),
+            "humeur": rng.choice(["😫", "😟", "😐", "🙂", "😄"]),
+            "energie": rng.randint(1, 5),
+            "charge": "🙂 Normal",
+            "a_probleme": a_probleme,
+            "type_probleme": "❓ Autre" if a_probleme else None,
+            "description_probleme": "bench" if a_probleme else None,
+            "urgence": "🟢 Faible" if a_probleme else None,
+            "impact_patient": False,
+            "victoire": None,
+            "besoin_aide": None,
+            "commentaire": None,
+            "cree_le": now.isoformat()
+        })
+    return checkins
+
+
+def run_child():
+    # Exécuté dans le sous-processus : rien ne doit être importé avant t0
+    t_start = time.perf_counter()
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    original_enqueue = ForwardMsgQueue.enqueue
+
+    def timed_enqueue(self, msg):
+        # Les blocs <style> sont invisibles : le premier élément affiché est
+        # l'en-tête (ou la météo de la barre latérale si l'ordre change)
+        if "first_element" not in timings and msg.WhichOneof("type") == "delta":
+            element = msg.delta.new_element
+            if element.WhichOneof("type") == "markdown" and any(
+                    marker in element.markdown.body for marker in ('class="main-header"', 'class="weather-box"')):
+                timings["first_element"] = time.perf_counter()
+                timings["pandas_loaded"] = "pandas" in sys.modules
+        return original_enqueue(self, msg)
+
+    ForwardMsgQueue.enqueue = timed_enqueue
+
+    t_import = time.perf_counter()
+    at = AppTest.from_file(str(APP_FILE), default_timeout=120)
+    t0 = time.perf_counter()
+    at.run()
+    t_end = time.perf_counter()
+
+    print(json.dumps({
+        "streamlit_import": t_import - t_start,
+        "first_element": timings["first_element"] - t0,
+        "full_run": t_end - t0,
+        "pandas_at_first_element": timings["pandas_loaded"],
+        "exceptions": len(at.exception)
+    }))
+
+
+def run_once(data_root, external_fonts):
+    env = dict(os.environ, CHECKIN_EXTERNAL_FONTS="1" if external_fonts else "0")
+    result = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child"],
+        cwd=data_root, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="nombre de démarrages à froid")
+    parser.add_argument("--checkins", type=int, default=1000, help="check-ins synthétiques à générer")
+    parser.add_argument("--no-external-fonts", action="store_true", help="désactive Google Fonts")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    with tempfile.TemporaryDirectory() as data_root:
+        data_dir = Path(data_root) / "data"
+        data_dir.mkdir()
+        with open(data_dir / "checkins.json", "w", encoding="utf-8") as f:
+            json.dump(generate_checkins(args.checkins), f, ensure_ascii=False)
+
+        results = [run_once(data_root, not args.no_external_fonts) for _ in range(args.runs)]
+
+    print(f"{args.runs} démarrages à froid, {args.checkins} check-ins")
+    for key, label in [("streamlit_import", "Import streamlit"),
+                       ("first_element", "Premier élément"),
+                       ("full_run", "Exécution complète")]:
+        values = [r[key] * 1000 for r in results]
+        print(f"  {label:<20} médiane {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+    print(f"  pandas chargé au premier élément : {any(r['pandas_at_first_element'] for r in results)}")
+    if any(r["exceptions"] for r in results):
+        print("  ⚠️ des exceptions ont été levées pendant l'exécution")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Vérifie que le stockage en flux donne les mêmes résultats que pandas.
+
+Génère un historique synthétique dans un répertoire temporaire et compare :
+
+- iter_json_records / append_json_record avec json.load / json.dump(indent=2)
+  (contenu lu et octets écrits) ;
+- aggregate_checkins avec les calculs pandas d'origine du tableau de bord
+  (indicateurs, distribution des humeurs, évolution par jour, moyennes par
+  site) sur 7, 14 et 30 jours ;
+- la météo de la barre latérale (résumé par jour) avec l'ancien calcul
+  pandas de calculate_team_weather.
+
+Le code de sortie est 1 au premier écart :
+
+    python check_storage.py --checkins 20000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import storage
+from bench_startup import generate_checkins
+
+
+def check_json_io(checkins):
+    records = checkins[:50]
+    records[3] = {**records[3], "commentaire": 'guillemet " ] , { } \\ é 🧬'}
+
+    path = storage.DATA_DIR / "io.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    for chunk_size in (7, 100, 4096, storage.CHUNK_SIZE):
+        assert list(storage.iter_json_records(path, chunk_size)) == records, f"lecture, blocs de {chunk_size}"
+
+    expected = storage.DATA_DIR / "expected.json"
+    for base in ([], records[:2]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(base, f, ensure_ascii=False, indent=2)
+        for record in records[2:5]:
+            storage.append_json_record(path, record)
+        with open(expected, "w", encoding="utf-8") as f:
+            json.dump(base + records[2:5], f, ensure_ascii=False, indent=2)
+        assert path.read_bytes() == expected.read_bytes(), f"ajout à {len(base)} enregistrements"
+
+    path.unlink()
+    storage.append_json_record(path, records[0])
+    assert storage.load_json(path) == [records[0]], "ajout à un fichier absent"
+
+
+def _pandas_team_weather(df_recent):
+    # Calcul d'origine de la barre latérale
+    if df_recent.empty:
+        return "❓", "Pas de données"
+    avg_humeur = df_recent["humeur"].map(storage.HUMEUR_SCORES).mean()
+    avg_energie = df_recent["energie"].mean()
+    nb_problemes = df_recent["a_probleme"].sum()
+    score = ((avg_humeur / 5) * 40 + (avg_energie / 5) * 40 - (nb_problemes / len(df_recent)) * 20)
+    score = max(0, min(100, score * 100 / 80))
+
+    if score >= 80:
+        return "☀️", f"Excellent ({score:.0f}/100)"
+    elif score >= 60:
+        return "🌤️", f"Bon ({score:.0f}/100)"
+    elif score >= 40:
+        return "⛅", f"Moyen ({score:.0f}/100)"
+    elif score >= 20:
+        return "🌧️", f"Tendu ({score:.0f}/100)"
+    else:
+        return "⛈️", f"Critique ({score:.0f}/100)"
+
+
+def check_aggregates(checkins, now):
+    df = pd.DataFrame(checkins)
+    df["date"] = pd.to_datetime(df["date"])
+
+    for days in (7, 14, 30):
+        since = now - timedelta(days=days)
+        df_period = df[df["date"] >= since]
+        stats = storage.aggregate_checkins(storage.iter_checkins(), since=since)
+        total = stats["total"]
+        label = f"{days} jours"
+
+        assert total["nb"] == len(df_period), label
+        assert storage.mean_humeur(total) == df_period["humeur"].map(storage.HUMEUR_SCORES).mean(), label
+        assert storage.mean_energie(total) == df_period["energie"].mean(), label
+        assert total["problemes"] == int(df_period["a_probleme"].sum()), label
+
+        humeur_counts = df_period["humeur"].value_counts()
+        for emoji in storage.EMOJIS_HUMEUR:
+            assert stats["humeur_counts"].get(emoji, 0) == humeur_counts.get(emoji, 0), f"{label} {emoji}"
+
+        df_scores = df_period.copy()
+        df_scores["humeur_score"] = df_scores["humeur"].map(storage.HUMEUR_SCORES)
+
+        daily_pandas = df_scores.groupby("date").agg({
+            "humeur_score": "mean",
+            "energie": "mean"
+        }).rename(columns={"humeur_score": "Humeur", "energie": "Énergie"})
+        daily_stream = pd.DataFrame(
+            [(day, storage.mean_humeur(b), storage.mean_energie(b)) for day, b in sorted(stats["by_day"].items())],
+            columns=["date", "Humeur", "Énergie"]
+        )
+        daily_stream["date"] = pd.to_datetime(daily_stream["date"])
+        daily_stream = daily_stream.set_index("date")
+        pd.testing.assert_frame_equal(daily_pandas, daily_stream, check_index_type=False, check_freq=False)
+
+        site_pandas = df_scores.groupby("site").agg({
+            "humeur_score": "mean",
+            "energie": "mean"
+        }).round(2).rename(columns={"humeur_score": "Humeur moy.", "energie": "Énergie moy."})
+        site_stream = pd.DataFrame(
+            [(site, storage.mean_humeur(b), storage.mean_energie(b)) for site, b in sorted(stats["by_site"].items())],
+            columns=["site", "Humeur moy.", "Énergie moy."]
+        ).set_index("site").round(2)
+        pd.testing.assert_frame_equal(site_pandas, site_stream)
+
+    df_recent = df[df["date"] >= now - timedelta(days=storage.WEATHER_DAYS)]
+    assert storage.recent_weather(storage.load_weather_summary(), now=now) == _pandas_team_weather(df_recent), \
+        "météo de l'équipe"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checkins", type=int, default=20000, help="check-ins synthétiques à générer")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    checkins = generate_checkins(args.checkins, days=40, seed=args.seed)
+    now = datetime.now()
+
+    # Humeur absente ou inconnue, énergie manquante : pandas les ignore dans
+    # les moyennes, le stockage doit faire de même
+    today = now.strftime("%Y-%m-%d")
+    checkins[0] = {**checkins[0], "date": today, "humeur": None}
+    checkins[1] = {**checkins[1], "date": today, "humeur": "🤔"}
+    checkins[2] = {**checkins[2], "date": today, "energie": None}
+    checkins[3] = {key: value for key, value in checkins[3].items() if key != "humeur"}
+    checkins[3]["date"] = today
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # storage utilise des chemins relatifs au répertoire courant
+        os.chdir(tmp)
+        storage.ensure_data_dir()
+        with open(storage.CHECKINS_FILE, "w", encoding="utf-8") as f:
+            json.dump(checkins, f, ensure_ascii=False, indent=2)
+        try:
+            check_json_io(checkins)
+            check_aggregates(checkins, now)
+        except AssertionError as e:
+            print(f"❌ Écart avec le calcul de référence : {e}")
+            sys.exit(1)
+
+    print(f"✅ Lecture/écriture en flux et agrégats identiques à pandas ({args.checkins} check-ins)")
+
+
+if __name__ == "__main__":
+    main()
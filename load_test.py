@@ -0,0 +1,306 @@
+"""Test de charge : sessions simultanées qui enregistrent des données.
+
+Lance plusieurs sessions en parallèle (threads, processus, ou instances
+AppTest de l'application dans des processus séparés) dans un répertoire de
+données temporaire. Chaque session enregistre des check-ins, kudos, idées
+et mises à jour de statut au même instant. Un lecteur relit les fichiers
+pendant la rafale. Le rapport donne le débit, les percentiles de latence et
+un audit d'intégrité (enregistrements perdus, dupliqués, enregistrés malgré
+une erreur, id en double, ou fichiers corrompus). Le code de sortie est 1
+en cas d'anomalie, ce qui permet de s'en servir comme test de
+non-régression du stockage :
+
+    python load_test.py --sessions 20 --ops 25
+    python load_test.py --mode processes --sessions 8
+    python load_test.py --mode apptest --sessions 4 --ops 3
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import storage
+
+APP_FILE = Path(__file__).resolve().parent / "streamlit_app.py"
+
+OPERATIONS = ["checkin", "kudos", "idea", "status"]
+
+# Fichier et champ identifiant de chaque type d'enregistrement
+AUDITED_FILES = {
+    "checkin": (storage.CHECKINS_FILE, "id"),
+    "kudos": (storage.KUDOS_FILE, "id"),
+    "idea": (storage.IDEAS_FILE, "id"),
+    "status": (storage.PROBLEMS_STATUS_FILE, "problem_id"),
+}
+
+# =============================================================================
+# SESSIONS
+# =============================================================================
+
+def _submit(kind, key, rng):
+    now = datetime.now()
+    if kind == "checkin":
+        a_probleme = rng.random() < 0.2
+        storage.save_checkin({
+            "id": key,
+            "collaborateur": f"Charge {key}",
+            "site": rng.choice(["Site A", "Site B", "Site C"]),
+            "poste": "Technicien",
+            "date": now.strftime("%Y-%m-%d"),
+            "humeur": rng.choice(storage.EMOJIS_HUMEUR),
+            "energie": rng.randint(1, 5),
+            "charge": "🙂 Normal",
+            "a_probleme": a_probleme,
+            "type_probleme": "❓ Autre" if a_probleme else None,
+            "description_probleme": "test de charge" if a_probleme else None,
+            "urgence": "🟢 Faible" if a_probleme else None,
+            "impact_patient": False,
+            "victoire": None,
+            "besoin_aide": None,
+            "commentaire": None,
+            "cree_le": now.isoformat()
+        })
+    elif kind == "kudos":
+        storage.save_kudos({
+            "id": key,
+            "de": "Charge",
+            "pour": "Test",
+            "categorie": "🤝 Entraide",
+            "message": "test de charge",
+            "date": now.isoformat()
+        })
+    elif kind == "idea":
+        storage.save_idea({
+            "id": key,
+            "auteur": "Charge",
+            "categorie": "📋 Process",
+            "titre": key,
+            "description": "test de charge",
+            "date": now.isoformat(),
+            "statut": "🆕 Nouvelle"
+        })
+    else:
+        storage.update_problem_status(key, "🔵 En cours", "test de charge")
+
+def run_session(session, nb_ops, kinds, start_at, seed):
+    rng = random.Random(seed + session)
+    results = []
+    time.sleep(max(0, start_at - time.time()))
+    for i in range(nb_ops):
+        kind = kinds[(session + i) % len(kinds)]
+        key = f"load_{session}_{i}"
+        t0 = time.perf_counter()
+        error = None
+        try:
+            _submit(kind, key, rng)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append((kind, key, time.perf_counter() - t0, error))
+    return results
+
+def run_apptest_session(session, nb_ops, kinds, start_at, seed):
+    # Passe par l'interface : seuls les check-ins sont soumis, identifiés par
+    # leur commentaire (les id de l'application sont à la seconde près : leurs
+    # collisions sont comptées à part dans l'audit)
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_FILE), default_timeout=120).run()
+    users = at.sidebar.selectbox(key="user_select").options[1:]
+    at.sidebar.selectbox(key="user_select").select(users[session % len(users)]).run()
+    results = []
+    time.sleep(max(0, start_at - time.time()))
+    for i in range(nb_ops):
+        key = f"load_{session}_{i}"
+        t0 = time.perf_counter()
+        error = None
+        try:
+            fk = at.session_state["form_key"]
+            at.text_area(key=f"commentaire_{fk}").input(key)
+            at.button[0].click().run()
+            # L'historique affiche aussi les problèmes avec st.error : ne
+            # retenir que l'erreur levée par le bouton d'envoi
+            submit_errors = [e.value for e in at.error if e.value.startswith("Erreur")]
+            if at.exception:
+                error = at.exception[0].message
+            elif submit_errors:
+                error = submit_errors[0]
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append(("checkin", key, time.perf_counter() - t0, error))
+    return results
+
+def _watch_files(stop, read_errors):
+    # Lecteur concurrent : une session qui affiche l'application pendant la rafale
+    while not stop.is_set():
+        for path, _ in AUDITED_FILES.values():
+            try:
+                storage.load_json(path)
+            except (ValueError, OSError):
+                read_errors[path.name] += 1
+
+# =============================================================================
+# AUDIT
+# =============================================================================
+
+def audit(results, key_fields):
+    report = {}
+    for kind, (path, id_field) in AUDITED_FILES.items():
+        field = key_fields.get(kind, id_field)
+        attempted = {key for k, key, _, _ in results if k == kind}
+        succeeded = {key for k, key, _, error in results if k == kind and error is None}
+        if not attempted:
+            continue
+        entry = {"file": path.name, "expected": len(succeeded), "corrupted": False}
+        try:
+            records = storage.load_json(path)
+        except ValueError as e:
+            entry.update(corrupted=str(e), found=0, lost=len(succeeded), duplicated=0, written_on_error=0,
+                         duplicated_ids=0)
+            report[kind] = entry
+            continue
+        found = Counter(r.get(field) for r in records)
+        entry["found"] = sum(found[key] for key in attempted)
+        entry["lost"] = len(succeeded - set(found))
+        entry["duplicated"] = sum(count - 1 for key, count in found.items() if key in attempted and count > 1)
+        # Enregistré alors que l'envoi a échoué : l'utilisateur renverra un doublon
+        entry["written_on_error"] = len((attempted - succeeded) & set(found))
+        # Enregistrements suivis par un autre champ (mode apptest) : leur id
+        # doit rester unique, les statuts et les widgets du suivi en dépendent
+        entry["duplicated_ids"] = 0
+        if field != id_field:
+            ids = Counter(r.get(id_field) for r in records)
+            entry["duplicated_ids"] = sum(count - 1 for count in ids.values() if count > 1)
+        report[kind] = entry
+
+    # Le résumé météo doit refléter exactement les check-ins enregistrés
+    if "checkin" in report and not report["checkin"]["corrupted"]:
+        try:
+            summary = storage.load_json(storage.WEATHER_SUMMARY_FILE)
+            report["weather_summary"] = {
+                "expected": len(storage.load_checkins()),
+                "found": sum(day["nb"] for day in summary["days"].values()),
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            report["weather_summary"] = {"corrupted": str(e)}
+    return report
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+# =============================================================================
+# LIGNE DE COMMANDE
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["threads", "processes", "apptest"], default="threads")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions simultanées")
+    parser.add_argument("--ops", type=int, default=25, help="enregistrements par session")
+    parser.add_argument("--mix", default=",".join(OPERATIONS), help="types d'opérations (défaut : tous)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="répertoire où créer le sous-répertoire de travail "
+                                           "(défaut : répertoire temporaire du système)")
+    parser.add_argument("--json", action="store_true", help="rapport au format JSON")
+    args = parser.parse_args()
+
+    kinds = args.mix.split(",")
+    unknown = set(kinds) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"opérations inconnues : {', '.join(sorted(unknown))}")
+
+    # Toujours un sous-répertoire neuf : ne jamais écrire dans un data/ existant
+    with tempfile.TemporaryDirectory(prefix="load_test_", dir=args.data_dir) as tmp:
+        # storage utilise des chemins relatifs au répertoire courant
+        os.chdir(tmp)
+        if args.mode == "apptest":
+            # Un processus par AppTest : le runtime Streamlit est global au processus
+            session_fn, pool, key_fields = run_apptest_session, ProcessPoolExecutor, {"checkin": "commentaire"}
+        else:
+            session_fn = run_session
+            pool = ThreadPoolExecutor if args.mode == "threads" else ProcessPoolExecutor
+            key_fields = {}
+
+        stop = threading.Event()
+        read_errors = Counter()
+        watcher = threading.Thread(target=_watch_files, args=(stop, read_errors), daemon=True)
+
+        start_at = time.time() + (10 if args.mode == "apptest" else 1)
+        with pool(max_workers=args.sessions) as executor:
+            futures = [executor.submit(session_fn, session, args.ops, kinds, start_at, args.seed)
+                       for session in range(args.sessions)]
+            watcher.start()
+            results = [r for future in futures for r in future.result()]
+        elapsed = time.time() - start_at
+        stop.set()
+        watcher.join()
+
+        integrity = audit(results, key_fields)
+
+    latencies = {}
+    for kind in sorted({r[0] for r in results}):
+        values = sorted(r[2] * 1000 for r in results if r[0] == kind)
+        latencies[kind] = {p: _percentile(values, p) for p in (50, 95, 99, 100)}
+    errors = Counter(r[3] for r in results if r[3] is not None)
+
+    problems = (
+        sum(errors.values())
+        + sum(read_errors.values())
+        + sum(e.get("lost", 0) + e.get("duplicated", 0) + e.get("written_on_error", 0)
+              + e.get("duplicated_ids", 0) + bool(e.get("corrupted"))
+              for e in integrity.values())
+    )
+    summary = integrity.get("weather_summary", {})
+    if "found" in summary and summary["found"] != summary["expected"]:
+        problems += 1
+    report = {
+        "mode": args.mode,
+        "sessions": args.sessions,
+        "operations": len(results),
+        "elapsed_s": elapsed,
+        "throughput_ops_s": len(results) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": latencies,
+        "errors": dict(errors),
+        "read_errors": dict(read_errors),
+        "integrity": integrity,
+        "ok": problems == 0,
+    }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{args.mode} : {args.sessions} sessions, {len(results)} opérations en {elapsed:.2f} s "
+              f"({report['throughput_ops_s']:.1f} op/s)")
+        print("\nLatence (ms)        p50      p95      p99      max")
+        for kind, p in latencies.items():
+            print(f"  {kind:<12} {p[50]:8.1f} {p[95]:8.1f} {p[99]:8.1f} {p[100]:8.1f}")
+        print("\nIntégrité")
+        for kind, e in integrity.items():
+            if e.get("corrupted"):
+                print(f"  {kind:<16} ❌ fichier corrompu : {e['corrupted']}")
+            elif kind == "weather_summary":
+                print(f"  {kind:<16} {e['found']} check-ins comptés / {e['expected']} enregistrés")
+            else:
+                print(f"  {kind:<16} {e['expected']} réussis, {e['found']} trouvés, "
+                      f"{e['lost']} perdus, {e['duplicated']} dupliqués, "
+                      f"{e['written_on_error']} enregistrés malgré une erreur, "
+                      f"{e['duplicated_ids']} id en double")
+        for path, count in read_errors.items():
+            print(f"  lecture {path} : {count} échecs pendant la rafale")
+        for error, count in errors.most_common(5):
+            print(f"  {count} × {error}")
+        print("\n✅ Aucune anomalie" if report["ok"] else "\n❌ Anomalies détectées")
+
+    raise SystemExit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
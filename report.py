@@ -0,0 +1,384 @@
+"""Rapport hebdomadaire du flash meeting (HTML autonome, PDF en option).
+
+Les rapports sont mis en cache par (semaine, site) dans data/reports/ : le nom
+du fichier contient l'empreinte des données de la semaine, un rapport n'est
+donc régénéré que si ces données ont changé. Le rendu se fait dans un pool de
+processus :
+
+    python report.py --week 2026-W42 --site "Site A" --pdf
+    python report.py --year 2026 --workers 8
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from storage import (
+    DATA_DIR, HUMEUR_SCORES, EMOJIS_HUMEUR, KUDOS_FILE, IDEAS_FILE, PROBLEMS_STATUS_FILE,
+    iter_checkins, iter_json_records, weather_from_totals
+)
+
+REPORTS_DIR = DATA_DIR / "reports"
+
+# À incrémenter quand le gabarit change : invalide tous les rapports en cache
+REPORT_VERSION = 1
+
+JOURS = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
+
+# =============================================================================
+# SEMAINES
+# =============================================================================
+
+def week_key(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def week_bounds(key):
+    year, week = key.split("-W")
+    start = date.fromisocalendar(int(year), int(week), 1)
+    return start, start + timedelta(days=6)
+
+def weeks_of_year(year):
+    nb_weeks = date(year, 12, 28).isocalendar()[1]
+    return [f"{year}-W{week:02d}" for week in range(1, nb_weeks + 1)]
+
+# =============================================================================
+# DONNÉES D'UN RAPPORT
+# =============================================================================
+
+def _status_changes():
+    # Historique (jour, statut) de chaque problème, en un passage sur le fichier
+    changes = {}
+    for s in iter_json_records(PROBLEMS_STATUS_FILE):
+        changes.setdefault(s["problem_id"], []).append((s["updated_at"][:10], s["status"]))
+    return changes
+
+def _status_at(changes, problem_id, day_iso):
+    status = "🟡 En attente"
+    for day, s in changes.get(problem_id, []):
+        if day <= day_iso:
+            status = s
+    return status
+
+def load_report_data(weeks):
+    # Lecture en flux : on ne garde que les check-ins, kudos et idées des
+    # semaines demandées, et les problèmes encore ouverts à la fin de l'une
+    # d'elles (le rapport tourne aussi dans le serveur de l'application)
+    wanted = set(weeks)
+    ends = [week_bounds(week)[1].isoformat() for week in weeks]
+    changes = _status_changes()
+
+    def in_weeks(day_iso):
+        return week_key(date.fromisoformat(day_iso[:10])) in wanted
+
+    def open_at_some_end(c):
+        return any(c["date"] <= end and _status_at(changes, c["id"], end) != "✅ Résolu" for end in ends)
+
+    checkins = [c for c in iter_checkins()
+                if in_weeks(c["date"]) or (c.get("a_probleme") and open_at_some_end(c))]
+    kudos = [k for k in iter_json_records(KUDOS_FILE) if in_weeks(k["date"])]
+    ideas = [i for i in iter_json_records(IDEAS_FILE) if in_weeks(i["date"])]
+    return checkins, kudos, ideas, changes
+
+def build_payload(week, site, checkins, kudos, ideas, changes):
+    start, end = week_bounds(week)
+    start_iso, end_iso = start.isoformat(), end.isoformat()
+
+    def in_site(c):
+        return site is None or c["site"] == site
+
+    week_checkins = [c for c in checkins if start_iso <= c["date"] <= end_iso and in_site(c)]
+
+    # Problèmes déclarés jusqu'à la fin de la semaine et non résolus à cette date
+    open_problems = []
+    for c in checkins:
+        if c.get("a_probleme") and c["date"] <= end_iso and in_site(c):
+            status = _status_at(changes, c["id"], end_iso)
+            if status != "✅ Résolu":
+                open_problems.append({**c, "statut": status})
+
+    return {
+        "version": REPORT_VERSION,
+        "week": week,
+        "site": site,
+        "checkins": week_checkins,
+        "open_problems": open_problems,
+        "kudos": [k for k in kudos if start_iso <= k["date"][:10] <= end_iso],
+        "ideas": [i for i in ideas if start_iso <= i["date"][:10] <= end_iso],
+    }
+
+def fingerprint(payload):
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+def _site_slug(site):
+    if site is None:
+        return "tous"
+    return re.sub(r"[^a-z0-9]+", "-", site.lower()).strip("-")
+
+def report_path(week, site, fp, extension="html"):
+    return REPORTS_DIR / f"{week}_{_site_slug(site)}_{fp}.{extension}"
+
+# =============================================================================
+# RENDU HTML / PDF
+# =============================================================================
+
+REPORT_CSS = """
+body { font-family: 'Nunito', sans-serif; color: #333; max-width: 900px; margin: 2rem auto; }
+.main-header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+               padding: 1.5rem 2rem; border-radius: 15px; color: white; }
+.weather-box { text-align: center; padding: 1rem; background: #f8f9fa; border-radius: 10px; }
+.weather-emoji { font-size: 4rem; }
+.kudos-card { background: linear-gradient(135deg, #ffecd2 0%, #fcb69f 100%);
+              padding: 1rem; border-radius: 10px; margin: 0.5rem 0; }
+.idea-card { background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%);
+             padding: 1rem; border-radius: 10px; margin: 0.5rem 0; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border-bottom: 1px solid #ddd; padding: 0.4rem; text-align: left; }
+"""
+
+def _e(value):
+    return html.escape(str(value)) if value is not None else ""
+
+def _daily_means(payload):
+    start, _ = week_bounds(payload["week"])
+    days = [(start + timedelta(days=i)).isoformat() for i in range(7)]
+    means = []
+    for day in days:
+        rows = [c for c in payload["checkins"] if c["date"] == day]
+        if rows:
+            means.append((sum(HUMEUR_SCORES[c["humeur"]] for c in rows) / len(rows),
+                          sum(c["energie"] for c in rows) / len(rows)))
+        else:
+            means.append(None)
+    return means
+
+def _svg_curves(means, width=560, height=180):
+    pad = 30
+    step = (width - 2 * pad) / 6
+
+    def xy(i, value):
+        return pad + i * step, height - pad - (value - 1) / 4 * (height - 2 * pad)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">']
+    for level in range(1, 6):
+        _, y = xy(0, level)
+        parts.append(f'<line x1="{pad}" y1="{y:.1f}" x2="{width - pad}" y2="{y:.1f}" stroke="#eee"/>')
+        parts.append(f'<text x="5" y="{y + 4:.1f}" font-size="10">{level}</text>')
+    for i, jour in enumerate(JOURS):
+        x, _ = xy(i, 1)
+        parts.append(f'<text x="{x - 10:.1f}" y="{height - 8}" font-size="10">{jour}</text>')
+    for index, color, label in [(0, "#667eea", "Humeur"), (1, "#f39c12", "Énergie")]:
+        points = " ".join("%.1f,%.1f" % xy(i, m[index]) for i, m in enumerate(means) if m)
+        parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="2"/>')
+        parts.append(f'<text x="{width - pad - 60}" y="{15 + index * 14}" font-size="11" fill="{color}">{label}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+def _site_rows(checkins):
+    sites = {}
+    for c in checkins:
+        sites.setdefault(c["site"], []).append(c)
+    rows = []
+    for site, items in sorted(sites.items()):
+        rows.append(
+            f"<tr><td>{_e(site)}</td><td>{len(items)}</td>"
+            f"<td>{sum(HUMEUR_SCORES[c['humeur']] for c in items) / len(items):.2f}</td>"
+            f"<td>{sum(c['energie'] for c in items) / len(items):.2f}</td>"
+            f"<td>{sum(1 for c in items if c.get('a_probleme'))}</td></tr>"
+        )
+    return "".join(rows)
+
+def render_report(payload):
+    checkins = payload["checkins"]
+    start, end = week_bounds(payload["week"])
+    weather_emoji, weather_text = weather_from_totals(
+        len(checkins),
+        sum(HUMEUR_SCORES[c["humeur"]] for c in checkins),
+        sum(c["energie"] for c in checkins),
+        sum(1 for c in checkins if c.get("a_probleme"))
+    )
+    humeur_counts = {emoji: sum(1 for c in checkins if c["humeur"] == emoji) for emoji in EMOJIS_HUMEUR}
+
+    sections = [f"""
+<div class="main-header">
+    <h1 style="margin: 0;">🧬 Flash Meeting — semaine {_e(payload["week"])}</h1>
+    <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">{_e(payload["site"] or "Tous les sites")} •
+    du {start.strftime("%d/%m/%Y")} au {end.strftime("%d/%m/%Y")}</p>
+</div>
+<h2>🌡️ Météo de l'équipe</h2>
+<div class="weather-box">
+    <div class="weather-emoji">{weather_emoji}</div>
+    <div style="font-weight: bold;">{_e(weather_text)}</div>
+    <div style="font-size: 0.8rem; color: #666;">{len(checkins)} check-ins •
+    {" ".join(f"{emoji} {count}" for emoji, count in humeur_counts.items())}</div>
+</div>
+<h2>📈 Évolution humeur & énergie</h2>
+{_svg_curves(_daily_means(payload))}
+<h2>📍 Par site</h2>
+<table>
+    <tr><th>Site</th><th>Check-ins</th><th>Humeur moy.</th><th>Énergie moy.</th><th>Problèmes</th></tr>
+    {_site_rows(checkins)}
+</table>
+<h2>🔧 Problèmes ouverts ({len(payload["open_problems"])})</h2>
+"""]
+    if payload["open_problems"]:
+        sections.append("<table><tr><th>Date</th><th>Urgence</th><th>Type</th><th>Déclaré par</th>"
+                        "<th>Description</th><th>Statut</th></tr>")
+        for p in payload["open_problems"]:
+            sections.append(
+                f"<tr><td>{_e(p['date'])}</td><td>{_e(p['urgence'])}</td><td>{_e(p['type_probleme'])}</td>"
+                f"<td>{_e(p['collaborateur'])} ({_e(p['site'])})</td>"
+                f"<td>{_e(p['description_probleme'])}</td><td>{_e(p['statut'])}</td></tr>"
+            )
+        sections.append("</table>")
+    else:
+        sections.append("<p>✅ Aucun problème ouvert</p>")
+
+    sections.append(f"<h2>🌟 Kudos ({len(payload['kudos'])})</h2>")
+    for kudo in payload["kudos"]:
+        sections.append(f"""<div class="kudos-card"><strong>{_e(kudo['categorie'])}</strong><br>
+<b>{_e(kudo['de'])}</b> → <b>{_e(kudo['pour'])}</b><br><em>"{_e(kudo['message'])}"</em></div>""")
+
+    sections.append(f"<h2>💡 Nouvelles idées ({len(payload['ideas'])})</h2>")
+    for idea in payload["ideas"]:
+        sections.append(f"""<div class="idea-card"><strong>{_e(idea['categorie'])}</strong><br>
+<b>{_e(idea['titre'])}</b><p>{_e(idea['description'])}</p><small>Par {_e(idea['auteur'])}</small></div>""")
+
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>Flash Meeting {_e(payload["week"])}</title>
+<style>{REPORT_CSS}</style></head>
+<body>{"".join(sections)}</body>
+</html>
+"""
+
+def render_pdf(report_html):
+    try:
+        from weasyprint import HTML
+    except ImportError:
+        raise RuntimeError("L'export PDF nécessite le paquet weasyprint (pip install weasyprint)")
+    return HTML(string=report_html).write_pdf()
+
+def _render_job(payload, pdf):
+    report_html = render_report(payload)
+    return report_html, render_pdf(report_html) if pdf else None
+
+# =============================================================================
+# GÉNÉRATION AVEC CACHE
+# =============================================================================
+
+def _replace_file(path, data):
+    # Comme storage.save_json : fichier temporaire puis remplacement atomique,
+    # un rapport n'est jamais servi à moitié écrit
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with open(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _write_report(week, site, fp, report_html, report_pdf):
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = report_path(week, site, fp)
+    _replace_file(path, report_html.encode("utf-8"))
+    if report_pdf is not None:
+        _replace_file(report_path(week, site, fp, "pdf"), report_pdf)
+    # Supprimer les versions précédentes de ce rapport (un autre processus
+    # peut les avoir déjà supprimées)
+    for old in REPORTS_DIR.glob(f"{week}_{_site_slug(site)}_*"):
+        if not old.name.startswith(f"{week}_{_site_slug(site)}_{fp}."):
+            old.unlink(missing_ok=True)
+    return path
+
+def generate_reports(weeks, sites=(None,), pdf=False, max_workers=None):
+    checkins, kudos, ideas, changes = load_report_data(weeks)
+
+    paths = {}
+    jobs = []
+    for week in weeks:
+        for site in sites:
+            payload = build_payload(week, site, checkins, kudos, ideas, changes)
+            fp = fingerprint(payload)
+            path = report_path(week, site, fp)
+            if path.exists() and (not pdf or report_path(week, site, fp, "pdf").exists()):
+                paths[(week, site)] = path
+            else:
+                jobs.append((week, site, fp, payload))
+
+    if len(jobs) == 1 or max_workers == 1:
+        results = [_render_job(payload, pdf) for _, _, _, payload in jobs]
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_render_job, [job[3] for job in jobs], [pdf] * len(jobs)))
+    else:
+        results = []
+
+    for (week, site, fp, _), (report_html, report_pdf) in zip(jobs, results):
+        paths[(week, site)] = _write_report(week, site, fp, report_html, report_pdf)
+    return paths
+
+def generate_report(week, site=None, pdf=False):
+    return generate_reports([week], [site], pdf=pdf)[(week, site)]
+
+def report_content(week, site=None):
+    # Nom et contenu du rapport HTML, pour le bouton de téléchargement : si
+    # une régénération concurrente a supprimé le fichier entre-temps, on
+    # recommence (simple lecture du cache si rien n'a changé)
+    while True:
+        path = generate_report(week, site)
+        try:
+            return path.name, path.read_bytes()
+        except FileNotFoundError:
+            continue
+
+# =============================================================================
+# LIGNE DE COMMANDE
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--week", help="semaine ISO, ex. 2026-W42 (défaut : semaine en cours)")
+    group.add_argument("--year", type=int, help="génère toutes les semaines de l'année")
+    parser.add_argument("--site", action="append", help="site (répétable, défaut : tous les sites)")
+    parser.add_argument("--per-site", action="store_true", help="un rapport par site présent dans les données")
+    parser.add_argument("--pdf", action="store_true", help="génère aussi le PDF (nécessite weasyprint)")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus (défaut : nb de cœurs)")
+    args = parser.parse_args()
+
+    if args.year is not None:
+        if not 1 <= args.year <= 9998:
+            parser.error(f"année invalide : {args.year}")
+        weeks = weeks_of_year(args.year)
+    else:
+        weeks = [args.week or week_key(date.today())]
+        if not re.fullmatch(r"\d{4}-W\d{2}", weeks[0]):
+            parser.error(f"semaine invalide : {weeks[0]} (format attendu : 2026-W42)")
+        try:
+            week_bounds(weeks[0])
+        except ValueError as e:
+            parser.error(f"semaine invalide : {weeks[0]} ({e})")
+
+    sites = args.site or [None]
+    if args.per_site:
+        sites = [None] + sorted({c["site"] for c in iter_checkins()})
+
+    try:
+        paths = generate_reports(weeks, sites, pdf=args.pdf, max_workers=args.workers)
+    except RuntimeError as e:
+        parser.error(str(e))
+    for (week, site), path in sorted(paths.items(), key=lambda item: str(item[1])):
+        print(f"{week} {site or 'Tous les sites'} → {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+import json
+import os
+import re
+import shutil
+import tempfile
+import textwrap
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus (voir data_lock)
+    fcntl = None
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+# Ce module ne dépend ni de streamlit ni de pandas : il est importé au
+# démarrage de l'application et doit rester léger.
+
+# Fichiers de données
+DATA_DIR = Path("data")
+CHECKINS_FILE = DATA_DIR / "checkins.json"
+KUDOS_FILE = DATA_DIR / "kudos.json"
+IDEAS_FILE = DATA_DIR / "ideas.json"
+PROBLEMS_STATUS_FILE = DATA_DIR / "problems_status.json"
+WEATHER_SUMMARY_FILE = DATA_DIR / "weather_summary.json"
+LOCK_FILE = DATA_DIR / ".lock"
+
+# Mapping humeur vers score numérique
+HUMEUR_SCORES = {"😫": 1, "😟": 2, "😐": 3, "🙂": 4, "😄": 5}
+EMOJIS_HUMEUR = ["😫", "😟", "😐", "🙂", "😄"]
+
+# Fenêtre de la météo d'équipe affichée dans la barre latérale
+WEATHER_DAYS = 7
+
+# À incrémenter quand le format du résumé météo change : force sa reconstruction
+WEATHER_SUMMARY_VERSION = 2
+
+# Taille des blocs lus par la lecture en flux des fichiers JSON
+CHUNK_SIZE = 64 * 1024
+
+# =============================================================================
+# FONCTIONS DE DONNÉES
+# =============================================================================
+
+def ensure_data_dir():
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+# Streamlit sert chaque session dans un thread, et plusieurs processus
+# (serveur, pool de rapports, scripts) peuvent écrire dans data/ : toutes les
+# écritures passent par un verrou exclusif, les lectures par un verrou
+# partagé. Le verrou est réentrant dans un même thread.
+# Sans fcntl (Windows), seul le verrou de threads reste : lectures et
+# écritures le prennent toutes, ce qui protège les sessions d'un même
+# serveur mais pas les autres processus.
+
+_write_lock = threading.RLock()
+_held = threading.local()
+
+@contextmanager
+def data_lock(exclusive=True):
+    mode = getattr(_held, "mode", None)
+    if mode is not None:
+        if exclusive and mode == "shared":
+            raise RuntimeError("Écriture impossible pendant une lecture en cours")
+        yield
+        return
+    if not exclusive and not DATA_DIR.exists():
+        # Rien à lire : inutile de créer le répertoire
+        yield
+        return
+    thread_lock = exclusive or fcntl is None
+    if thread_lock:
+        _write_lock.acquire()
+    try:
+        ensure_data_dir()
+        with open(LOCK_FILE, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            _held.mode = "exclusive" if exclusive else "shared"
+            try:
+                yield
+            finally:
+                _held.mode = None
+    finally:
+        if thread_lock:
+            _write_lock.release()
+
+def load_json(filepath):
+    with data_lock(exclusive=False):
+        if filepath.exists():
+            with open(filepath, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+def save_json(filepath, data):
+    # Écriture dans un fichier temporaire puis remplacement atomique : un
+    # lecteur ne voit jamais de fichier à moitié écrit
+    with data_lock():
+        fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.")
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            if filepath.exists():
+                shutil.copymode(filepath, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+# Les fichiers sont des tableaux JSON : l'historique peut couvrir plusieurs
+# années, on le lit donc enregistrement par enregistrement et on ajoute les
+# nouveaux enregistrements en fin de fichier sans le recharger.
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+def iter_json_records(filepath, chunk_size=CHUNK_SIZE):
+    with data_lock(exclusive=False):
+        if filepath.exists():
+            yield from _iter_json_file(filepath, chunk_size)
+
+def _iter_json_file(filepath, chunk_size):
+    decoder = json.JSONDecoder()
+    with open(filepath, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{filepath} : tableau JSON attendu")
+        pos = 1
+        eof = False
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if buffer.startswith("]", pos):
+                return
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Enregistrement coupé en fin de bloc : lire la suite
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield record
+
+def append_json_record(filepath, record):
+    entry = textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2), "  ")
+    with data_lock():
+        if not filepath.exists() or filepath.stat().st_size == 0:
+            save_json(filepath, [record])
+            return
+        with open(filepath, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            tail_start = max(0, size - 4096)
+            f.seek(tail_start)
+            tail = f.read()
+            end = tail.rstrip()
+            before = end[:-1].rstrip()
+            if end.endswith(b"]") and (before or tail_start == 0):
+                separator = "\n" if before.endswith(b"[") else ",\n"
+                f.seek(tail_start + len(before))
+                f.truncate()
+                f.write((separator + entry + "\n]").encode("utf-8"))
+                return
+        _repair_and_append(filepath, record)
+
+def _repair_and_append(filepath, record):
+    # Fin de fichier inattendue (arrêt brutal pendant une écriture) : on
+    # garde une copie du fichier, on récupère les enregistrements lisibles et
+    # on réécrit le tout
+    shutil.copy2(filepath, filepath.with_name(f"{filepath.name}.{datetime.now():%Y%m%d%H%M%S}.bak"))
+    records = []
+    try:
+        for existing in _iter_json_file(filepath, CHUNK_SIZE):
+            records.append(existing)
+    except ValueError:
+        pass
+    records.append(record)
+    save_json(filepath, records)
+
+def load_checkins():
+    return load_json(CHECKINS_FILE)
+
+def iter_checkins():
+    return iter_json_records(CHECKINS_FILE)
+
+def has_checkins():
+    return next(iter_checkins(), None) is not None
+
+def save_checkin(checkin_data):
+    with data_lock():
+        summary_fresh = _summary_is_fresh()
+        append_json_record(CHECKINS_FILE, checkin_data)
+        # Le check-in est enregistré : un échec sur le résumé ne doit pas
+        # remonter (l'utilisateur renverrait un doublon), il sera reconstruit
+        # à la prochaine lecture
+        try:
+            if summary_fresh:
+                update_weather_summary(checkin_data)
+            else:
+                rebuild_weather_summary()
+        except Exception:
+            _mark_summary_stale()
+
+def load_kudos():
+    return load_json(KUDOS_FILE)
+
+def save_kudos(kudo_data):
+    append_json_record(KUDOS_FILE, kudo_data)
+
+def load_ideas():
+    return load_json(IDEAS_FILE)
+
+def save_idea(idea_data):
+    append_json_record(IDEAS_FILE, idea_data)
+
+def load_problems_status():
+    return load_json(PROBLEMS_STATUS_FILE)
+
+def latest_problem_statuses():
+    # Dernier statut de chaque problème, en un seul passage sur le fichier
+    return {s["problem_id"]: s["status"] for s in iter_json_records(PROBLEMS_STATUS_FILE)}
+
+def get_problem_status(problem_id):
+    return latest_problem_statuses().get(problem_id, "🟡 En attente")
+
+def update_problem_status(problem_id, new_status, resolution_note=""):
+    append_json_record(PROBLEMS_STATUS_FILE, {
+        "problem_id": problem_id,
+        "status": new_status,
+        "resolution_note": resolution_note,
+        "updated_at": datetime.now().isoformat()
+    })
+
+# =============================================================================
+# MÉTÉO DE L'ÉQUIPE
+# =============================================================================
+
+def weather_from_totals(nb_checkins, total_humeur, total_energie, nb_problemes):
+    if nb_checkins == 0:
+        return "❓", "Pas de données"
+    return _weather(total_humeur / nb_checkins, total_energie / nb_checkins, nb_problemes / nb_checkins)
+
+def weather_from_bucket(bucket):
+    if bucket["nb"] == 0:
+        return "❓", "Pas de données"
+    return _weather(mean_humeur(bucket), mean_energie(bucket), bucket["problemes"] / bucket["nb"])
+
+def _weather(avg_humeur, avg_energie, part_problemes):
+    score = ((avg_humeur / 5) * 40 + (avg_energie / 5) * 40 - part_problemes * 20)
+    score = max(0, min(100, score * 100 / 80))
+
+    if score >= 80:
+        return "☀️", f"Excellent ({score:.0f}/100)"
+    elif score >= 60:
+        return "🌤️", f"Bon ({score:.0f}/100)"
+    elif score >= 40:
+        return "⛅", f"Moyen ({score:.0f}/100)"
+    elif score >= 20:
+        return "🌧️", f"Tendu ({score:.0f}/100)"
+    else:
+        return "⛈️", f"Critique ({score:.0f}/100)"
+
+# Le résumé météo agrège les check-ins par jour : la barre latérale n'a plus
+# besoin de relire tout l'historique (ni d'importer pandas) à chaque session.
+# Chaque jour est un compteur du tableau de bord (voir _add_to_bucket) : les
+# valeurs manquantes sont ignorées de la même façon des deux côtés.
+
+def _add_to_summary(days, checkin):
+    _add_to_bucket(days.setdefault(checkin["date"], _new_bucket()), checkin)
+
+def build_weather_summary(checkins):
+    days = {}
+    for checkin in checkins:
+        _add_to_summary(days, checkin)
+    return {"version": WEATHER_SUMMARY_VERSION, "days": days}
+
+def rebuild_weather_summary():
+    with data_lock():
+        summary = build_weather_summary(iter_checkins())
+        save_json(WEATHER_SUMMARY_FILE, summary)
+    return summary
+
+def _mark_summary_stale():
+    try:
+        WEATHER_SUMMARY_FILE.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+def _summary_is_fresh():
+    if not (WEATHER_SUMMARY_FILE.exists() and CHECKINS_FILE.exists()):
+        return False
+    return WEATHER_SUMMARY_FILE.stat().st_mtime >= CHECKINS_FILE.stat().st_mtime
+
+def load_weather_summary():
+    if not CHECKINS_FILE.exists():
+        return {"days": {}}
+    if _summary_is_fresh():
+        try:
+            summary = load_json(WEATHER_SUMMARY_FILE)
+            if isinstance(summary, dict) and summary.get("version") == WEATHER_SUMMARY_VERSION:
+                return summary
+        except ValueError:
+            pass
+    # Résumé absent, illisible, d'un ancien format ou plus ancien que les
+    # check-ins (édition manuelle...)
+    return rebuild_weather_summary()
+
+def update_weather_summary(checkin_data):
+    with data_lock():
+        summary = load_json(WEATHER_SUMMARY_FILE)
+        _add_to_summary(summary["days"], checkin_data)
+        save_json(WEATHER_SUMMARY_FILE, summary)
+
+def recent_weather(summary, days=WEATHER_DAYS, now=None):
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    totals = _new_bucket()
+    for date, day in summary["days"].items():
+        if datetime.fromisoformat(date) >= cutoff:
+            for key in totals:
+                totals[key] += day[key]
+    return weather_from_bucket(totals)
+
+# =============================================================================
+# AGRÉGATION EN FLUX
+# =============================================================================
+# Calcule en un seul passage les indicateurs du tableau de bord : la mémoire
+# utilisée ne dépend que du nombre de jours et de sites, pas de l'historique.
+# Les moyennes ignorent les valeurs manquantes, comme pandas.
+
+def _new_bucket():
+    return {"nb": 0, "humeur": 0, "nb_humeur": 0, "energie": 0, "nb_energie": 0, "problemes": 0}
+
+def _add_to_bucket(bucket, checkin):
+    bucket["nb"] += 1
+    score = HUMEUR_SCORES.get(checkin.get("humeur"))
+    if score is not None:
+        bucket["humeur"] += score
+        bucket["nb_humeur"] += 1
+    if checkin.get("energie") is not None:
+        bucket["energie"] += checkin["energie"]
+        bucket["nb_energie"] += 1
+    bucket["problemes"] += 1 if checkin.get("a_probleme") else 0
+
+def aggregate_checkins(checkins, since=None):
+    stats = {
+        "total": _new_bucket(),
+        "humeur_counts": {},
+        "by_day": {},
+        "by_site": {},
+    }
+    for checkin in checkins:
+        if since is not None and datetime.fromisoformat(checkin["date"]) < since:
+            continue
+        _add_to_bucket(stats["total"], checkin)
+        _add_to_bucket(stats["by_day"].setdefault(checkin["date"], _new_bucket()), checkin)
+        _add_to_bucket(stats["by_site"].setdefault(checkin["site"], _new_bucket()), checkin)
+        humeur = checkin.get("humeur")
+        stats["humeur_counts"][humeur] = stats["humeur_counts"].get(humeur, 0) + 1
+    return stats
+
+def mean_humeur(bucket):
+    return bucket["humeur"] / bucket["nb_humeur"] if bucket["nb_humeur"] else float("nan")
+
+def mean_energie(bucket):
+    return bucket["energie"] / bucket["nb_energie"] if bucket["nb_energie"] else float("nan")
@@ -1,8 +1,19 @@
 import streamlit as st
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from pathlib import Path
-import json
+import multiprocessing
+import os
+
+from storage import (
+    EMOJIS_HUMEUR,
+    iter_checkins, has_checkins, save_checkin, load_kudos, save_kudos, load_ideas, save_idea,
+    latest_problem_statuses, update_problem_status, load_weather_summary, recent_weather,
+    aggregate_checkins, mean_humeur, mean_energie
+)
+from report import week_key, report_content
+
+# pandas n'est importé que par les onglets qui en ont besoin (historique,
+# tableau de bord, suivi) pour ne pas retarder le premier affichage.
 
 # =============================================================================
 # CONFIGURATION
@@ -14,49 +25,44 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Fichiers de données
-DATA_DIR = Path("data")
-CHECKINS_FILE = DATA_DIR / "checkins.json"
-KUDOS_FILE = DATA_DIR / "kudos.json"
-IDEAS_FILE = DATA_DIR / "ideas.json"
-PROBLEMS_STATUS_FILE = DATA_DIR / "problems_status.json"
-
 # Configuration équipe - À ADAPTER SELON TON ÉQUIPE
 COLLABORATEURS = ["Marie", "Thomas", "Sophie", "Lucas", "Emma", "Julie", "Pierre", "Camille"]
 SITES = ["Site A", "Site B", "Site C"]
 POSTES = ["Technicien", "Biologiste", "Secrétaire", "Coursier", "Responsable"]
 
-# Mapping humeur vers score numérique
-HUMEUR_SCORES = {"😫": 1, "😟": 2, "😐": 3, "🙂": 4, "😄": 5}
-EMOJIS_HUMEUR = ["😫", "😟", "😐", "🙂", "😄"]
+# Police Google Fonts : désactiver avec CHECKIN_EXTERNAL_FONTS=0 sur les
+# réseaux sans accès internet (la police système sans-serif est alors utilisée)
+EXTERNAL_FONTS = os.environ.get("CHECKIN_EXTERNAL_FONTS", "1") != "0"
 
 # =============================================================================
 # INITIALISATION SESSION STATE
 # =============================================================================
-if "checkin_submitted" not in st.session_state:
-    st.session_state.checkin_submitted = False
-if "kudos_submitted" not in st.session_state:
-    st.session_state.kudos_submitted = False
-if "idea_submitted" not in st.session_state:
-    st.session_state.idea_submitted = False
-if "form_key" not in st.session_state:
-    st.session_state.form_key = 0
-if "show_success_checkin" not in st.session_state:
-    st.session_state.show_success_checkin = False
-if "show_success_kudos" not in st.session_state:
-    st.session_state.show_success_kudos = False
-if "show_success_idea" not in st.session_state:
-    st.session_state.show_success_idea = False
-if "kudos_destinataire" not in st.session_state:
-    st.session_state.kudos_destinataire = ""
+SESSION_DEFAULTS = {
+    "checkin_submitted": False,
+    "kudos_submitted": False,
+    "idea_submitted": False,
+    "form_key": 0,
+    "show_success_checkin": False,
+    "show_success_kudos": False,
+    "show_success_idea": False,
+    "kudos_destinataire": "",
+    "report_job": None,
+}
+for key, value in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
 
 # =============================================================================
 # STYLES CSS PERSONNALISÉS
 # =============================================================================
-st.markdown("""
+if EXTERNAL_FONTS:
+    st.markdown("""
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Nunito:wght@400;600;700&display=swap');
-    
+</style>
+""", unsafe_allow_html=True)
+
+st.markdown("""
+<style>
     * { font-family: 'Nunito', sans-serif; }
     
     .main-header {
@@ -96,91 +102,25 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # =============================================================================
-# FONCTIONS DE DONNÉES
+# HEADER
 # =============================================================================
+st.markdown("""
+<div class="main-header">
+    <h1 style="margin: 0;">🧬 Check-in Flash Meeting</h1>
+    <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">Plateau Technique de Biologie</p>
+</div>
+""", unsafe_allow_html=True)
 
-def ensure_data_dir():
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-def load_json(filepath):
-    if filepath.exists():
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
-
-def save_json(filepath, data):
-    ensure_data_dir()
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def load_checkins():
-    return load_json(CHECKINS_FILE)
-
-def save_checkin(checkin_data):
-    checkins = load_checkins()
-    checkins.append(checkin_data)
-    save_json(CHECKINS_FILE, checkins)
-
-def load_kudos():
-    return load_json(KUDOS_FILE)
-
-def save_kudos(kudo_data):
-    kudos = load_kudos()
-    kudos.append(kudo_data)
-    save_json(KUDOS_FILE, kudos)
-
-def load_ideas():
-    return load_json(IDEAS_FILE)
-
-def save_idea(idea_data):
-    ideas = load_ideas()
-    ideas.append(idea_data)
-    save_json(IDEAS_FILE, ideas)
-
-def load_problems_status():
-    return load_json(PROBLEMS_STATUS_FILE)
-
-def get_problem_status(problem_id):
-    statuses = load_problems_status()
-    problem_statuses = [s for s in statuses if s.get("problem_id") == problem_id]
-    if problem_statuses:
-        return problem_statuses[-1]["status"]
-    return "🟡 En attente"
-
-def update_problem_status(problem_id, new_status, resolution_note=""):
-    statuses = load_problems_status()
-    statuses.append({
-        "problem_id": problem_id,
-        "status": new_status,
-        "resolution_note": resolution_note,
-        "updated_at": datetime.now().isoformat()
-    })
-    save_json(PROBLEMS_STATUS_FILE, statuses)
-
-def calculate_team_weather(df_recent):
-    if df_recent.empty:
-        return "❓", "Pas de données"
-    
-    humeur_scores = df_recent["humeur"].map(HUMEUR_SCORES)
-    energie_scores = df_recent["energie"]
-    
-    avg_humeur = humeur_scores.mean()
-    avg_energie = energie_scores.mean()
-    nb_problemes = df_recent["a_probleme"].sum()
-    
-    score = ((avg_humeur / 5) * 40 + (avg_energie / 5) * 40 - (nb_problemes / len(df_recent)) * 20)
-    score = max(0, min(100, score * 100 / 80))
-    
-    if score >= 80:
-        return "☀️", f"Excellent ({score:.0f}/100)"
-    elif score >= 60:
-        return "🌤️", f"Bon ({score:.0f}/100)"
-    elif score >= 40:
-        return "⛅", f"Moyen ({score:.0f}/100)"
-    elif score >= 20:
-        return "🌧️", f"Tendu ({score:.0f}/100)"
-    else:
-        return "⛈️", f"Critique ({score:.0f}/100)"
+# =============================================================================
+# RAPPORTS EN ARRIÈRE-PLAN
+# =============================================================================
+# Un seul pool partagé par toutes les sessions : la génération du rapport
+# hebdomadaire se fait hors du script Streamlit. "spawn" plutôt que "fork" :
+# forker le serveur multi-thread peut hériter de verrous tenus par d'autres
+# threads et bloquer le processus fils.
+@st.cache_resource
+def report_executor():
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
 
 # =============================================================================
 # SIDEBAR
@@ -201,13 +141,9 @@ with st.sidebar:
     
     st.markdown("### 🌡️ Météo de l'équipe")
     
-    checkins = load_checkins()
-    if checkins:
-        df_all = pd.DataFrame(checkins)
-        df_all["date"] = pd.to_datetime(df_all["date"])
-        df_recent = df_all[df_all["date"] >= (datetime.now() - timedelta(days=7))]
-        
-        weather_emoji, weather_text = calculate_team_weather(df_recent)
+    weather_summary = load_weather_summary()
+    if weather_summary["days"]:
+        weather_emoji, weather_text = recent_weather(weather_summary)
         
         st.markdown(f"""
         <div class="weather-box">
@@ -219,16 +155,6 @@ with st.sidebar:
     else:
         st.info("Aucun check-in enregistré")
 
-# =============================================================================
-# HEADER
-# =============================================================================
-st.markdown("""
-<div class="main-header">
-    <h1 style="margin: 0;">🧬 Check-in Flash Meeting</h1>
-    <p style="margin: 0.5rem 0 0 0; opacity: 0.9;">Plateau Technique de Biologie</p>
-</div>
-""", unsafe_allow_html=True)
-
 # =============================================================================
 # ONGLETS
 # =============================================================================
@@ -524,12 +450,10 @@ with tab_historique:
     
     st.subheader("📋 Historique des check-ins")
     
-    checkins = load_checkins()
-    
-    if not checkins:
+    if not has_checkins():
         st.info("Aucun check-in enregistré")
     else:
-        df = pd.DataFrame(checkins)
+        import pandas as pd
         
         col1, col2, col3 = st.columns(3)
         
@@ -540,19 +464,21 @@ with tab_historique:
         with col3:
             filtre_jours = st.slider("📅 Derniers jours", 1, 30, 7, key="hist_jours")
         
-        df["date"] = pd.to_datetime(df["date"])
-        df = df[df["date"] >= (datetime.now() - timedelta(days=filtre_jours))]
-        
-        if filtre_collab:
-            df = df[df["collaborateur"].isin(filtre_collab)]
-        if filtre_site:
-            df = df[df["site"].isin(filtre_site)]
+        # Filtrage en flux : seuls les check-ins affichés sont chargés en mémoire
+        date_min = datetime.now() - timedelta(days=filtre_jours)
+        df = pd.DataFrame([
+            c for c in iter_checkins()
+            if datetime.fromisoformat(c["date"]) >= date_min
+            and (not filtre_collab or c["collaborateur"] in filtre_collab)
+            and (not filtre_site or c["site"] in filtre_site)
+        ])
         
         st.markdown("---")
         
         if df.empty:
             st.info("Aucun résultat")
         else:
+            df["date"] = pd.to_datetime(df["date"])
             df_sorted = df.sort_values("date", ascending=False)
             
             for _, row in df_sorted.iterrows():
@@ -587,38 +513,33 @@ with tab_stats:
     
     st.subheader("📊 Tableau de bord")
     
-    checkins = load_checkins()
-    
-    if not checkins:
+    if not has_checkins():
         st.info("Pas de données")
     else:
-        df = pd.DataFrame(checkins)
-        df["date"] = pd.to_datetime(df["date"])
-        
         periode = st.radio("Période", ["7 jours", "14 jours", "30 jours"], horizontal=True)
         
         days = int(periode.split()[0])
-        df_period = df[df["date"] >= (datetime.now() - timedelta(days=days))]
+        stats = aggregate_checkins(iter_checkins(), since=datetime.now() - timedelta(days=days))
+        total = stats["total"]
         
-        if df_period.empty:
+        if total["nb"] == 0:
             st.warning("Pas de données sur cette période")
         else:
+            import pandas as pd
+            
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("📝 Check-ins", len(df_period))
+                st.metric("📝 Check-ins", total["nb"])
             
             with col2:
-                avg_humeur = df_period["humeur"].map(HUMEUR_SCORES).mean()
-                st.metric("😊 Humeur", f"{avg_humeur:.1f}/5")
+                st.metric("😊 Humeur", f"{mean_humeur(total):.1f}/5")
             
             with col3:
-                avg_energie = df_period["energie"].mean()
-                st.metric("⚡ Énergie", f"{avg_energie:.1f}/5")
+                st.metric("⚡ Énergie", f"{mean_energie(total):.1f}/5")
             
             with col4:
-                nb_pb = df_period["a_probleme"].sum()
-                st.metric("⚠️ Problèmes", int(nb_pb))
+                st.metric("⚠️ Problèmes", total["problemes"])
             
             st.markdown("---")
             
@@ -627,17 +548,11 @@ with tab_stats:
             with col_g1:
                 st.markdown("#### 📈 Évolution humeur & énergie")
                 
-                df_daily = df_period.copy()
-                df_daily["humeur_score"] = df_daily["humeur"].map(HUMEUR_SCORES)
-                df_agg = df_daily.groupby("date").agg({
-                    "humeur_score": "mean",
-                    "energie": "mean"
-                }).reset_index()
-                
-                df_agg = df_agg.rename(columns={
-                    "humeur_score": "Humeur",
-                    "energie": "Énergie"
-                })
+                df_agg = pd.DataFrame(
+                    [(day, mean_humeur(b), mean_energie(b)) for day, b in sorted(stats["by_day"].items())],
+                    columns=["date", "Humeur", "Énergie"]
+                )
+                df_agg["date"] = pd.to_datetime(df_agg["date"])
                 df_agg = df_agg.set_index("date")
                 
                 st.line_chart(df_agg, height=300)
@@ -645,7 +560,7 @@ with tab_stats:
             with col_g2:
                 st.markdown("#### 🌡️ Distribution des humeurs")
                 
-                humeur_counts = df_period["humeur"].value_counts()
+                humeur_counts = stats["humeur_counts"]
                 
                 cols = st.columns(5)
                 for i, emoji in enumerate(EMOJIS_HUMEUR):
@@ -662,19 +577,50 @@ with tab_stats:
             
             st.markdown("#### 📍 Humeur moyenne par site")
             
-            df_site = df_period.copy()
-            df_site["humeur_score"] = df_site["humeur"].map(HUMEUR_SCORES)
-            site_agg = df_site.groupby("site").agg({
-                "humeur_score": "mean",
-                "energie": "mean"
-            }).round(2)
-            
-            site_agg = site_agg.rename(columns={
-                "humeur_score": "Humeur moy.",
-                "energie": "Énergie moy."
-            })
+            site_agg = pd.DataFrame(
+                [(site, mean_humeur(b), mean_energie(b)) for site, b in sorted(stats["by_site"].items())],
+                columns=["site", "Humeur moy.", "Énergie moy."]
+            ).set_index("site").round(2)
             
             st.dataframe(site_agg, use_container_width=True)
+        
+        st.markdown("---")
+        
+        st.markdown("#### 📄 Rapport du flash meeting")
+        
+        col_r1, col_r2, col_r3 = st.columns(3)
+        
+        with col_r1:
+            semaine_rapport = st.date_input("📅 Semaine du", value=datetime.now(), key="report_date")
+        with col_r2:
+            site_rapport = st.selectbox("📍 Site", ["Tous les sites"] + SITES, key="report_site")
+        
+        week = week_key(semaine_rapport)
+        site = None if site_rapport == "Tous les sites" else site_rapport
+        
+        with col_r3:
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("📄 Générer le rapport", use_container_width=True):
+                future = report_executor().submit(report_content, week, site)
+                st.session_state.report_job = (week, site, future)
+        
+        job = st.session_state.report_job
+        if job and job[:2] == (week, site):
+            future = job[2]
+            if not future.done():
+                st.info(f"⏳ Rapport {week} en cours de génération...")
+                st.button("🔄 Actualiser", key="report_refresh")
+            elif future.exception():
+                st.error(f"Erreur : {future.exception()}")
+            else:
+                report_name, report_data = future.result()
+                st.download_button(
+                    "⬇️ Télécharger le rapport",
+                    data=report_data,
+                    file_name=report_name,
+                    mime="text/html",
+                    use_container_width=True
+                )
 
 # =============================================================================
 # TAB 6 : SUIVI PROBLÈMES
@@ -683,57 +629,56 @@ with tab_suivi:
     
     st.subheader("🔧 Suivi des problèmes")
     
-    checkins = load_checkins()
-    
-    if not checkins:
+    if not has_checkins():
         st.info("Aucun check-in")
+    elif not any(c.get("a_probleme") for c in iter_checkins()):
+        st.success("✅ Aucun problème remonté !")
     else:
-        df = pd.DataFrame(checkins)
-        problemes = df[df["a_probleme"] == True].copy()
+        statuts = latest_problem_statuses()
         
-        if problemes.empty:
-            st.success("✅ Aucun problème remonté !")
-        else:
-            problemes["statut_actuel"] = problemes["id"].apply(get_problem_status)
-            
-            filtre_statut = st.multiselect(
-                "Filtrer par statut",
-                ["🟡 En attente", "🔵 En cours", "✅ Résolu"],
-                default=["🟡 En attente", "🔵 En cours"],
-                key="suivi_statut"
-            )
-            
-            if filtre_statut:
-                problemes = problemes[problemes["statut_actuel"].isin(filtre_statut)]
-            
-            st.markdown("---")
-            
-            for _, row in problemes.iterrows():
-                with st.expander(f"{row['urgence']} | {row['type_probleme']} - {row['collaborateur']}"):
-                    
-                    st.markdown(f"**Déclaré par :** {row['collaborateur']} ({row['site']})")
-                    st.markdown(f"**Description :** {row['description_probleme']}")
-                    st.markdown(f"**Statut :** {row['statut_actuel']}")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        new_status = st.selectbox(
-                            "Nouveau statut",
-                            ["🟡 En attente", "🔵 En cours", "✅ Résolu"],
-                            key=f"status_{row['id']}"
-                        )
-                    
-                    with col2:
-                        if new_status == "✅ Résolu":
-                            note = st.text_input("Note de résolution", key=f"note_{row['id']}")
-                        else:
-                            note = ""
-                    
-                    if st.button("💾 Mettre à jour", key=f"btn_{row['id']}"):
-                        update_problem_status(row["id"], new_status, note)
-                        st.success("Statut mis à jour !")
-                        st.rerun()
+        filtre_statut = st.multiselect(
+            "Filtrer par statut",
+            ["🟡 En attente", "🔵 En cours", "✅ Résolu"],
+            default=["🟡 En attente", "🔵 En cours"],
+            key="suivi_statut"
+        )
+        
+        # Seuls les problèmes affichés sont gardés en mémoire
+        problemes = []
+        for c in iter_checkins():
+            if c.get("a_probleme"):
+                statut = statuts.get(c["id"], "🟡 En attente")
+                if not filtre_statut or statut in filtre_statut:
+                    problemes.append({**c, "statut_actuel": statut})
+        
+        st.markdown("---")
+        
+        for row in problemes:
+            with st.expander(f"{row['urgence']} | {row['type_probleme']} - {row['collaborateur']}"):
+                
+                st.markdown(f"**Déclaré par :** {row['collaborateur']} ({row['site']})")
+                st.markdown(f"**Description :** {row['description_probleme']}")
+                st.markdown(f"**Statut :** {row['statut_actuel']}")
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    new_status = st.selectbox(
+                        "Nouveau statut",
+                        ["🟡 En attente", "🔵 En cours", "✅ Résolu"],
+                        key=f"status_{row['id']}"
+                    )
+                
+                with col2:
+                    if new_status == "✅ Résolu":
+                        note = st.text_input("Note de résolution", key=f"note_{row['id']}")
+                    else:
+                        note = ""
+                
+                if st.button("💾 Mettre à jour", key=f"btn_{row['id']}"):
+                    update_problem_status(row["id"], new_status, note)
+                    st.success("Statut mis à jour !")
+                    st.rerun()
 
 # =============================================================================
 # FOOTER